@@ -13,29 +13,92 @@ import json
 import csv
 import sys
 import argparse
-from typing import Dict, List, Tuple
-from botocore.exceptions import ClientError
-from openai import OpenAI
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+from botocore.config import Config
+from openai import OpenAI, RateLimitError, InternalServerError, APIConnectionError
 import httpx
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 
 # Set UTF-8 encoding for Windows console
 if sys.platform == 'win32':
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
 
 # Constants
 REGION = 'us-east-1'
 TEST_PROMPT = "Hi"
+TEST_MAX_TOKENS = 1  # we only need to know the request shape is accepted
+RESPONSES_MAX_OUTPUT_TOKENS = 16  # the responses API rejects max_output_tokens below 16
+THROTTLED = "?"  # probe was throttled or failed transiently, so support could not be determined
+RETRYABLE_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceQuotaExceededException',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'InternalServerException',
+    'TransportError',  # connection failures and timeouts raised by httpx
+}
+MAX_ATTEMPTS = 5  # attempts per request, with backoff between them
+PROBE_RETRIES = MAX_ATTEMPTS - 1  # probe_with_retry is the only retry layer for probes
 TIMEOUT = 30
+RUNTIME_URL = f"https://bedrock-runtime.{REGION}.amazonaws.com"
+RUNTIME_OPENAI_URL = f"https://bedrock-runtime.{REGION}.amazonaws.com/openai/v1"
+MANTLE_OPENAI_URL = f"https://bedrock-mantle.{REGION}.api.aws/v1"
+MAX_WORKERS = 32
+
+_credentials_lock = threading.Lock()
+_credentials = None
+
+
+def get_frozen_credentials(session):
+    """Return frozen credentials, resolving the provider chain only once per run"""
+    global _credentials
+    if _credentials is None:
+        with _credentials_lock:
+            if _credentials is None:
+                _credentials = session.get_credentials()
+    # Refreshable credentials renew themselves ahead of expiry when frozen
+    return _credentials.get_frozen_credentials()
+
+
+# (date stamp, region, service, access key) -> derived SigV4 signing key
+_signing_keys = {}
+
+
+class CachedKeySigV4Auth(SigV4Auth):
+    """SigV4Auth that derives the signing key once per day, region, service and credentials"""
+    def signature(self, string_to_sign, request):
+        cache_key = (
+            request.context['timestamp'][0:8],
+            self._region_name,
+            self._service_name,
+            self.credentials.access_key,
+        )
+        k_signing = _signing_keys.get(cache_key)
+        if k_signing is None:
+            k_date = self._sign(f"AWS4{self.credentials.secret_key}".encode(), cache_key[0])
+            k_region = self._sign(k_date, self._region_name)
+            k_service = self._sign(k_region, self._service_name)
+            k_signing = self._sign(k_service, 'aws4_request')
+            # Racing threads derive the same key, so a plain dict is safe here
+            _signing_keys[cache_key] = k_signing
+        return self._sign(k_signing, string_to_sign, hex=True)
+
 
 class AWSBedrockMantleAuth(httpx.Auth):
     """Custom authentication for bedrock-mantle using AWS SigV4"""
-    def __init__(self, service: str, region: str, credentials):
+    def __init__(self, service: str, region: str, session):
         self.service = service
         self.region = region
-        self.credentials = credentials
+        self.session = session
 
     def auth_flow(self, request: httpx.Request):
         headers_to_sign = {
@@ -50,7 +113,7 @@ class AWSBedrockMantleAuth(httpx.Auth):
             headers=headers_to_sign
         )
         
-        signer = SigV4Auth(self.credentials, self.service, self.region)
+        signer = CachedKeySigV4Auth(get_frozen_credentials(self.session), self.service, self.region)
         signer.add_auth(aws_request)
         
         for key, value in aws_request.headers.items():
@@ -59,12 +122,53 @@ class AWSBedrockMantleAuth(httpx.Auth):
         yield request
 
 
+def create_signed_http_client(service: str, session, base_url: str = "") -> httpx.Client:
+    """Create an httpx client signed with SigV4, sharing one connection pool across threads"""
+    return httpx.Client(
+        base_url=base_url,
+        auth=AWSBedrockMantleAuth(service, REGION, session),
+        timeout=TIMEOUT,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    )
+
+
+def create_openai_client(base_url: str, http_client: httpx.Client) -> OpenAI:
+    """Create an OpenAI SDK client on top of a SigV4-signed httpx client"""
+    # SDK retries are off so they don't multiply with probe_with_retry
+    return OpenAI(
+        api_key="dummy",
+        base_url=base_url,
+        max_retries=0,
+        http_client=http_client
+    )
+
+
+def list_all(bedrock_client, operation: str, result_key: str) -> List[Dict]:
+    """Collect every page of a bedrock list operation"""
+    # Not every list operation has a botocore paginator; those return everything in one call
+    if not bedrock_client.can_paginate(operation):
+        return getattr(bedrock_client, operation)().get(result_key, [])
+    return [
+        item
+        for page in bedrock_client.get_paginator(operation).paginate()
+        for item in page.get(result_key, [])
+    ]
+
+
+def warmup(http_client: httpx.Client, url: str):
+    """Issue one cheap request so the connection pool holds a live TLS session before probing"""
+    try:
+        http_client.get(url)
+    except Exception:
+        # Any response, even an error, has already established the connection
+        pass
+
+
 def discover_runtime_models(bedrock_client) -> List[Dict]:
     """Discover models from bedrock-runtime service"""
     print("Discovering models from bedrock-runtime...")
     try:
-        response = bedrock_client.list_foundation_models()
-        models = response.get('modelSummaries', [])
+        models = list_all(bedrock_client, 'list_foundation_models', 'modelSummaries')
         print(f"Found {len(models)} models in bedrock-runtime")
         return [{'modelId': m['modelId'], 'service': 'bedrock-runtime'} for m in models]
     except Exception as e:
@@ -72,21 +176,13 @@ def discover_runtime_models(bedrock_client) -> List[Dict]:
         return []
 
 
-def discover_mantle_models(session) -> List[Dict]:
+def discover_mantle_models(mantle_openai_client: OpenAI) -> List[Dict]:
     """Discover models from bedrock-mantle service"""
     print("Discovering models from bedrock-mantle...")
     try:
-        credentials = session.get_credentials().get_frozen_credentials()
-        client = OpenAI(
-            api_key="dummy",
-            base_url=f"https://bedrock-mantle.{REGION}.api.aws/v1",
-            http_client=httpx.Client(
-                auth=AWSBedrockMantleAuth("bedrock-mantle", REGION, credentials),
-                timeout=TIMEOUT
-            )
-        )
-        models = client.models.list()
-        model_list = [{'modelId': m.id, 'service': 'bedrock-mantle'} for m in models.data]
+        # Iterating the page (rather than .data) follows pagination
+        models = mantle_openai_client.with_options(max_retries=MAX_ATTEMPTS - 1).models.list()
+        model_list = [{'modelId': m.id, 'service': 'bedrock-mantle'} for m in models]
         print(f"Found {len(model_list)} models in bedrock-mantle")
         return model_list
     except Exception as e:
@@ -94,117 +190,289 @@ def discover_mantle_models(session) -> List[Dict]:
         return []
 
 
+# Inference profile id prefixes; anything without one is in-region
+PROFILE_PREFIX_PATTERN = re.compile(r'^(?:(?P<regional>us|eu|ap)|(?P<global_>global))\.')
+PROFILE_TYPE_ORDER = ['in-region', 'regional-cross-region', 'global-cross-region']
+
+
+def classify_profile(profile_id: str) -> str:
+    """Classify an inference profile by its id prefix"""
+    match = PROFILE_PREFIX_PATTERN.match(profile_id)
+    if match is None:
+        return 'in-region'
+    return 'regional-cross-region' if match.group('regional') else 'global-cross-region'
+
+
 def discover_inference_profiles(bedrock_client) -> Dict[str, str]:
-    """Discover inference profiles and categorize them"""
+    """Discover inference profiles and map each model they route to onto its profile type(s)"""
     print("Discovering inference profiles...")
     try:
-        response = bedrock_client.list_inference_profiles()
-        profiles = response.get('inferenceProfileSummaries', [])
+        profiles = list_all(bedrock_client, 'list_inference_profiles', 'inferenceProfileSummaries')
         
-        profile_map = {}
+        types_by_model = {}
         for profile in profiles:
             profile_id = profile.get('inferenceProfileId', '')
-            if profile_id.startswith('us.') or profile_id.startswith('eu.') or profile_id.startswith('ap.'):
-                profile_type = 'regional-cross-region'
-            elif profile_id.startswith('global.'):
-                profile_type = 'global-cross-region'
-            else:
-                profile_type = 'in-region'
-            profile_map[profile_id] = profile_type
+            profile_type = classify_profile(profile_id)
+            # Profiles list the foundation models they route to by ARN
+            for model in profile.get('models', []):
+                model_id = model.get('modelArn', '').rsplit('/', 1)[-1]
+                types_by_model.setdefault(model_id, set()).add(profile_type)
         
-        print(f"Found {len(profile_map)} inference profiles")
-        return profile_map
+        profile_type_by_model = {
+            model_id: ','.join(t for t in PROFILE_TYPE_ORDER if t in types)
+            for model_id, types in types_by_model.items()
+        }
+        print(f"Found {len(profiles)} inference profiles covering {len(profile_type_by_model)} models")
+        return profile_type_by_model
     except Exception as e:
         print(f"Error discovering inference profiles: {e}")
         return {}
 
 
-def test_invoke_api(bedrock_runtime, model_id: str) -> str:
-    """Test invoke_model API"""
+def call_runtime(runtime_http_client: httpx.Client, model_id: str, action: str,
+                 body: bytes) -> Optional[str]:
+    """POST a probe body to a bedrock-runtime model action, returning the AWS error
+    code on failure or None on success"""
     try:
-        # Try standard format first
-        body = json.dumps({
-            "messages": [{"role": "user", "content": [{"text": TEST_PROMPT}]}],
-            "inferenceConfig": {"max_new_tokens": 10}
-        })
-        bedrock_runtime.invoke_model(modelId=model_id, body=body)
+        response = runtime_http_client.post(
+            f"/model/{quote(model_id, safe='')}/{action}",
+            content=body,
+            headers={'content-type': 'application/json', 'accept': 'application/json'}
+        )
+    except httpx.TransportError:
+        return 'TransportError'
+    if response.is_success:
+        return None
+    # REST errors carry the code as "Code:namespace" in x-amzn-ErrorType
+    error_code = response.headers.get('x-amzn-errortype', '').split(':', 1)[0]
+    # Throttling and server-side failures say nothing about support, so keep them retryable
+    if error_code not in RETRYABLE_ERROR_CODES:
+        if response.status_code == 429:
+            error_code = 'ThrottlingException'
+        elif response.status_code >= 500:
+            error_code = 'InternalServerException'
+    return error_code
+
+
+def probe_result(error_code: Optional[str]) -> str:
+    """Map a call_runtime outcome to a matrix marker"""
+    if error_code is None:
         return "✓"
-    except ClientError as e:
-        error_code = e.response.get('Error', {}).get('Code', '')
-        # If it's a validation error, try alternative format
-        if 'Validation' in error_code:
-            try:
-                # Try Anthropic format
-                body = json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 10,
-                    "messages": [{"role": "user", "content": TEST_PROMPT}]
-                })
-                bedrock_runtime.invoke_model(modelId=model_id, body=body)
-                return "✓"
-            except Exception:
-                pass
-        return "✗"
+    return THROTTLED if error_code in RETRYABLE_ERROR_CODES else "✗"
+
+
+def _anthropic_body(prompt: str, max_tokens: int) -> bytes:
+    return json.dumps({
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "messages": [{"role": "user", "content": prompt}]
+    }).encode()
+
+
+def _titan_text_body(prompt: str, max_tokens: int) -> bytes:
+    return json.dumps({
+        "inputText": prompt,
+        "textGenerationConfig": {"maxTokenCount": max_tokens}
+    }).encode()
+
+
+def _titan_embed_body(prompt: str, max_tokens: int) -> bytes:
+    return json.dumps({"inputText": prompt}).encode()
+
+
+def _llama_body(prompt: str, max_tokens: int) -> bytes:
+    return json.dumps({"prompt": prompt, "max_gen_len": max_tokens}).encode()
+
+
+def _mistral_body(prompt: str, max_tokens: int) -> bytes:
+    return json.dumps({"prompt": f"<s>[INST] {prompt} [/INST]", "max_tokens": max_tokens}).encode()
+
+
+def _cohere_command_r_body(prompt: str, max_tokens: int) -> bytes:
+    return json.dumps({"message": prompt, "max_tokens": max_tokens}).encode()
+
+
+def _cohere_command_body(prompt: str, max_tokens: int) -> bytes:
+    return json.dumps({"prompt": prompt, "max_tokens": max_tokens}).encode()
+
+
+def _cohere_embed_body(prompt: str, max_tokens: int) -> bytes:
+    return json.dumps({"texts": [prompt], "input_type": "search_query"}).encode()
+
+
+# invoke_model body schema by model id prefix, so known families get the right
+# request shape on the first call instead of after a failed round-trip.
+# The first matching prefix wins, so more specific prefixes come first.
+BODY_BUILDERS = {
+    'anthropic.': _anthropic_body,
+    'amazon.titan-text': _titan_text_body,
+    'amazon.titan-embed': _titan_embed_body,
+    'meta.llama': _llama_body,
+    'mistral.': _mistral_body,
+    'cohere.command-r': _cohere_command_r_body,
+    'cohere.command': _cohere_command_body,
+    'cohere.embed': _cohere_embed_body,
+}
+
+# Probe bodies never change between models, so serialize them once at import time
+STANDARD_BODY = json.dumps({
+    "messages": [{"role": "user", "content": [{"text": TEST_PROMPT}]}],
+    "inferenceConfig": {"max_new_tokens": TEST_MAX_TOKENS}
+}).encode()
+ANTHROPIC_BODY = _anthropic_body(TEST_PROMPT, TEST_MAX_TOKENS)
+CONVERSE_BODY = json.dumps({
+    "messages": [{"role": "user", "content": [{"text": TEST_PROMPT}]}],
+    "inferenceConfig": {"maxTokens": TEST_MAX_TOKENS}
+}).encode()
+INVOKE_BODIES = {prefix: build(TEST_PROMPT, TEST_MAX_TOKENS) for prefix, build in BODY_BUILDERS.items()}
+
+
+def test_invoke_api(runtime_http_client: httpx.Client, model_id: str) -> str:
+    """Test invoke_model API"""
+    body = next(
+        (body for prefix, body in INVOKE_BODIES.items() if model_id.startswith(prefix)),
+        None
+    )
+    try:
+        if body is not None:
+            return probe_result(call_runtime(runtime_http_client, model_id, 'invoke', body))
+        
+        # Unknown family: try standard format first
+        error_code = call_runtime(runtime_http_client, model_id, 'invoke', STANDARD_BODY)
+        # If it's a validation error, try Anthropic format
+        if error_code is not None and 'Validation' in error_code:
+            error_code = call_runtime(runtime_http_client, model_id, 'invoke', ANTHROPIC_BODY)
+        return probe_result(error_code)
     except Exception:
         return "✗"
 
 
-def test_converse_api(bedrock_runtime, model_id: str) -> str:
+def test_converse_api(runtime_http_client: httpx.Client, model_id: str) -> str:
     """Test converse API"""
     try:
-        bedrock_runtime.converse(
-            modelId=model_id,
-            messages=[{"role": "user", "content": [{"text": TEST_PROMPT}]}],
-            inferenceConfig={"maxTokens": 10}
-        )
-        return "✓"
+        return probe_result(call_runtime(runtime_http_client, model_id, 'converse', CONVERSE_BODY))
     except Exception:
         return "✗"
 
 
-def test_chat_completions_api(session, model_id: str) -> str:
+def test_chat_completions_api(runtime_openai_client: OpenAI, model_id: str) -> str:
     """Test chat completions API via OpenAI SDK"""
     try:
-        credentials = session.get_credentials().get_frozen_credentials()
-        client = OpenAI(
-            api_key="dummy",
-            base_url=f"https://bedrock-runtime.{REGION}.amazonaws.com/openai/v1",
-            http_client=httpx.Client(
-                auth=AWSBedrockMantleAuth("bedrock-runtime", REGION, credentials),
-                timeout=TIMEOUT
-            )
-        )
-        client.chat.completions.create(
+        runtime_openai_client.chat.completions.create(
             model=model_id,
             messages=[{"role": "user", "content": TEST_PROMPT}],
-            max_tokens=10
+            max_tokens=TEST_MAX_TOKENS
         )
         return "✓"
+    except (RateLimitError, InternalServerError, APIConnectionError):
+        return THROTTLED
     except Exception:
         return "✗"
 
 
-def test_responses_api(session, model_id: str) -> str:
+def test_responses_api(mantle_openai_client: OpenAI, model_id: str) -> str:
     """Test responses API via OpenAI SDK"""
     try:
-        credentials = session.get_credentials().get_frozen_credentials()
-        client = OpenAI(
-            api_key="dummy",
-            base_url=f"https://bedrock-mantle.{REGION}.api.aws/v1",
-            http_client=httpx.Client(
-                auth=AWSBedrockMantleAuth("bedrock-mantle", REGION, credentials),
-                timeout=TIMEOUT
-            )
-        )
-        client.responses.create(
+        mantle_openai_client.responses.create(
             model=model_id,
-            input=[{"role": "user", "content": TEST_PROMPT}]
+            input=[{"role": "user", "content": TEST_PROMPT}],
+            max_output_tokens=RESPONSES_MAX_OUTPUT_TOKENS
         )
         return "✓"
+    except (RateLimitError, InternalServerError, APIConnectionError):
+        return THROTTLED
     except Exception:
         return "✗"
 
 
+# (service or model id prefix, API column) combinations that are unsupported by design
+KNOWN_UNSUPPORTED = {
+    ('bedrock-mantle', 'Invoke_API'),
+    ('bedrock-mantle', 'Converse_API'),
+    ('amazon.titan-embed', 'Converse_API'),
+    ('amazon.titan-embed', 'ChatCompletions_API'),
+    ('amazon.titan-embed', 'Responses_API'),
+    ('cohere.embed', 'Converse_API'),
+    ('cohere.embed', 'ChatCompletions_API'),
+    ('cohere.embed', 'Responses_API'),
+}
+
+
+def is_known_unsupported(model_id: str, service: str, api: str) -> bool:
+    """Whether a model/API combination is unsupported by design and needs no probe"""
+    # Service keys match exactly, so models offered by both services are still probed
+    return any(
+        api == skip_api and (service == key or model_id.startswith(key))
+        for key, skip_api in KNOWN_UNSUPPORTED
+    )
+
+
+def probe_with_retry(probe, *args) -> str:
+    """Re-run a probe with exponential backoff while it keeps coming back throttled"""
+    result = probe(*args)
+    for attempt in range(PROBE_RETRIES):
+        if result != THROTTLED:
+            break
+        time.sleep(2 ** attempt + random.random())
+        result = probe(*args)
+    return result
+
+
+def run_model(model: Dict, runtime_http_client: httpx.Client, runtime_openai_client: OpenAI,
+              mantle_openai_client: OpenAI, profile_type_by_model: Dict[str, str]) -> Tuple[Dict, List[str]]:
+    """Test all 4 APIs against a single model and return its matrix row and log lines"""
+    model_id = model['modelId']
+    service = model['service']
+    
+    # Determine profile type for this model
+    profile_type = profile_type_by_model.get(model_id, 'in-region')
+    
+    # Test all 4 APIs concurrently; httpx clients are thread-safe
+    api_probes = {
+        'Invoke_API': (test_invoke_api, runtime_http_client),
+        'Converse_API': (test_converse_api, runtime_http_client),
+        'ChatCompletions_API': (test_chat_completions_api, runtime_openai_client),
+        'Responses_API': (test_responses_api, mantle_openai_client),
+    }
+    skipped = {api for api in api_probes if is_known_unsupported(model_id, service, api)}
+    with ThreadPoolExecutor(max_workers=4) as probes:
+        futures = {
+            api: probes.submit(probe_with_retry, probe, client, model_id)
+            for api, (probe, client) in api_probes.items()
+            if api not in skipped
+        }
+        wait(futures.values())
+    
+    # Known-unsupported combinations are answered locally without a network call
+    api_results = {api: "✗" if api in skipped else futures[api].result() for api in api_probes}
+    
+    log_lines = [f"\n{model_id} ({service})\n"]
+    for api, log_name in [('Invoke_API', 'invoke_model'), ('Converse_API', 'converse'),
+                          ('ChatCompletions_API', 'chat_completions'), ('Responses_API', 'responses')]:
+        note = " (skipped, known unsupported)" if api in skipped else ""
+        log_lines.append(f"  {log_name}: {api_results[api]}{note}\n")
+    
+    return {
+        'Model': model_id,
+        'Service': service,
+        'Profile_Type': profile_type,
+        **api_results
+    }, log_lines
+
+
+def print_progress(progress_q: queue.Queue, total_tests: int):
+    """Print progress lines from the queue until a None sentinel arrives"""
+    while True:
+        item = progress_q.get()
+        if item is None:
+            return
+        done, result = item
+        # Service is wide enough for models offered by both services
+        print(f"[{done}/{total_tests}] {result['Model']:<60} ({result['Service']:<30}) "
+              f"inv={result['Invoke_API']} conv={result['Converse_API']} "
+              f"chat={result['ChatCompletions_API']} resp={result['Responses_API']}")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Generate Bedrock model compatibility matrix')
     parser.add_argument('--output', default='bedrock_compatibility_matrix.csv', 
@@ -213,21 +481,54 @@ def main():
                        help='Limit number of models to test (for quick testing)')
     parser.add_argument('--error-log', default='bedrock_errors.log',
                        help='Error log filename')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                       help='Number of models to test concurrently')
     args = parser.parse_args()
     
     # Initialize AWS clients
     session = boto3.Session(region_name=REGION)
-    bedrock_client = session.client('bedrock')
-    bedrock_runtime = session.client('bedrock-runtime')
+    boto_config = Config(
+        # Adaptive mode adds client-side rate limiting on top of backoff for throttling
+        retries={'max_attempts': MAX_ATTEMPTS, 'mode': 'adaptive'},
+        connect_timeout=5,
+        read_timeout=TIMEOUT
+    )
+    bedrock_client = session.client('bedrock', config=boto_config)
+    
+    # Resolve credentials once up front; every probe reuses the cached copy
+    get_frozen_credentials(session)
+    # invoke_model/converse go straight to the REST API; bedrock-runtime signs as "bedrock"
+    runtime_http_client = create_signed_http_client("bedrock", session, RUNTIME_URL)
+    runtime_openai_http_client = create_signed_http_client("bedrock-runtime", session)
+    runtime_openai_client = create_openai_client(RUNTIME_OPENAI_URL, runtime_openai_http_client)
+    mantle_openai_client = create_openai_client(
+        MANTLE_OPENAI_URL, create_signed_http_client("bedrock-mantle", session)
+    )
     
-    # Open error log
-    error_log = open(args.error_log, 'w', encoding='utf-8')
+    # Task 1 & 2: Discover models and inference profiles concurrently
+    with ThreadPoolExecutor(max_workers=5) as discovery:
+        runtime_future = discovery.submit(discover_runtime_models, bedrock_client)
+        mantle_future = discovery.submit(discover_mantle_models, mantle_openai_client)
+        profiles_future = discovery.submit(discover_inference_profiles, bedrock_client)
+        # Model discovery already primes the mantle connection pool
+        warmup_futures = [
+            discovery.submit(warmup, runtime_http_client, "/"),
+            discovery.submit(warmup, runtime_openai_http_client, f"{RUNTIME_OPENAI_URL}/models"),
+        ]
+        wait([runtime_future, mantle_future, profiles_future] + warmup_futures)
     
-    # Task 1: Discover models
-    runtime_models = discover_runtime_models(bedrock_client)
-    mantle_models = discover_mantle_models(session)
+    runtime_models = runtime_future.result()
+    mantle_models = mantle_future.result()
+    profile_type_by_model = profiles_future.result()
     
-    all_models = runtime_models + mantle_models
+    # Collapse models offered by both services so each is only probed once
+    services_by_id = {}
+    for m in runtime_models + mantle_models:
+        services_by_id.setdefault(m['modelId'], set()).add(m['service'])
+    all_models = [
+        {'modelId': model_id, 'service': ','.join(sorted(services))}
+        for model_id, services in services_by_id.items()
+    ]
     
     if args.limit:
         all_models = all_models[:args.limit]
@@ -235,83 +536,71 @@ def main():
     
     print(f"\nTotal models to test: {len(all_models)}")
     
-    # Task 2: Discover inference profiles
-    inference_profiles = discover_inference_profiles(bedrock_client)
+    service_counts = {'bedrock-runtime': 0, 'bedrock-mantle': 0}
+    for m in all_models:
+        for service in m['service'].split(','):
+            service_counts[service] += 1
     
     print("\n=== Discovery Complete ===")
-    print(f"Models from bedrock-runtime: {len([m for m in all_models if m['service'] == 'bedrock-runtime'])}")
-    print(f"Models from bedrock-mantle: {len([m for m in all_models if m['service'] == 'bedrock-mantle'])}")
-    print(f"Inference profiles: {len(inference_profiles)}")
+    print(f"Models from bedrock-runtime: {service_counts['bedrock-runtime']}")
+    print(f"Models from bedrock-mantle: {service_counts['bedrock-mantle']}")
+    print(f"Models with inference profiles: {len(profile_type_by_model)}")
     
-    # Task 4: Generate compatibility matrix
+    # Task 4 & 5: Generate compatibility matrix, streaming rows to CSV as models finish
     print("\n=== Testing API Compatibility ===")
-    results = []
+    print(f"Writing results to {args.output}")
     total_tests = len(all_models)
+    models_tested = 0
+    total_supported = 0
+    api_columns = ['Invoke_API', 'Converse_API', 'ChatCompletions_API', 'Responses_API']
     
-    for idx, model in enumerate(all_models, 1):
-        model_id = model['modelId']
-        service = model['service']
-        
-        print(f"\n[{idx}/{total_tests}] Testing {model_id} ({service})")
-        error_log.write(f"\n[{idx}/{total_tests}] {model_id} ({service})\n")
-        
-        # Determine profile type for this model
-        profile_type = inference_profiles.get(model_id, 'in-region')
-        
-        # Test all 4 APIs
-        print(f"  Testing invoke_model...", end=' ')
-        invoke_result = test_invoke_api(bedrock_runtime, model_id)
-        print(invoke_result)
-        error_log.write(f"  invoke_model: {invoke_result}\n")
-        
-        print(f"  Testing converse...", end=' ')
-        converse_result = test_converse_api(bedrock_runtime, model_id)
-        print(converse_result)
-        error_log.write(f"  converse: {converse_result}\n")
-        
-        print(f"  Testing chat_completions...", end=' ')
-        chat_result = test_chat_completions_api(session, model_id)
-        print(chat_result)
-        error_log.write(f"  chat_completions: {chat_result}\n")
-        
-        print(f"  Testing responses...", end=' ')
-        responses_result = test_responses_api(session, model_id)
-        print(responses_result)
-        error_log.write(f"  responses: {responses_result}\n")
-        
-        results.append({
-            'Model': model_id,
-            'Service': service,
-            'Profile_Type': profile_type,
-            'Invoke_API': invoke_result,
-            'Converse_API': converse_result,
-            'ChatCompletions_API': chat_result,
-            'Responses_API': responses_result
-        })
-    
-    error_log.close()
+    # A single printer thread owns stdout so the result loop never waits on console I/O
+    progress_q = queue.Queue()
+    printer = threading.Thread(target=print_progress, args=(progress_q, total_tests), daemon=True)
+    printer.start()
     
-    # Task 5: Write CSV output
-    print(f"\n=== Writing Results to {args.output} ===")
-    with open(args.output, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['Model', 'Service', 'Profile_Type', 'Invoke_API', 'Converse_API', 
-                     'ChatCompletions_API', 'Responses_API']
+    with open(args.output, 'w', newline='', encoding='utf-8') as csvfile, \
+            open(args.error_log, 'w', encoding='utf-8') as error_log, \
+            ThreadPoolExecutor(max_workers=args.workers) as executor:
+        fieldnames = ['Model', 'Service', 'Profile_Type'] + api_columns
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
         writer.writeheader()
-        for result in results:
-            writer.writerow(result)
+        
+        futures = [
+            executor.submit(run_model, model, runtime_http_client, runtime_openai_client,
+                            mantle_openai_client, profile_type_by_model)
+            for model in all_models
+        ]
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                result, log_lines = future.result()
+                # Flush each row and its log lines so partial progress survives an interrupted
+                # run; this loop is the only writer, so each model's lines go out in one call
+                writer.writerow(result)
+                csvfile.flush()
+                error_log.writelines(log_lines)
+                error_log.flush()
+                
+                models_tested += 1
+                total_supported += sum(1 for api in api_columns if result[api] == '✓')
+                progress_q.put((done, result))
+        except KeyboardInterrupt:
+            # Drop queued models rather than probing them only to discard the results
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    
+    progress_q.put(None)
+    printer.join()
+    
+    runtime_http_client.close()
+    runtime_openai_client.close()
+    mantle_openai_client.close()
     
     # Summary statistics
-    total_supported = sum(
-        1 for r in results 
-        for api in ['Invoke_API', 'Converse_API', 'ChatCompletions_API', 'Responses_API']
-        if r[api] == '✓'
-    )
-    total_combinations = len(results) * 4
+    total_combinations = models_tested * 4
     
     print(f"\n=== Summary ===")
-    print(f"Total models tested: {len(results)}")
+    print(f"Total models tested: {models_tested}")
     print(f"Total API combinations: {total_combinations}")
     print(f"Supported combinations: {total_supported}")
     print(f"Success rate: {total_supported/total_combinations*100:.1f}%")